@@ -1,24 +1,100 @@
 # controller.py
 import paho.mqtt.client as mqtt
 import requests
+import threading
+import hashlib
 import json
 import time
 import os
 
 class CentralController:
-    def __init__(self, catalog_url):
+    def __init__(self, catalog_url, state_file="controller_state.json", snapshot_interval=5, max_state_age=120):
         self.catalog_url = catalog_url
         self.config = {}
+        self.config_version = None
         self.soil_topic = None
         self.weather_topic = None
         self.pump_topic = None
         self.last_soil_data = None
         self.last_weather_data = None
+        self.device_state = {}  # last reading per sensor_id
+        self.pump_state = {"last_activation": None, "duration": 0}
+
+        # Local snapshot so a restart can resume decisions without waiting for fresh readings
+        self.state_file = state_file
+        self.snapshot_interval = snapshot_interval
+        self.max_state_age = max_state_age  # a few sensor sample intervals
+        self.last_snapshot = 0
+        self.state_lock = threading.Lock()
 
         self.mqtt_client = mqtt.Client()
         self.mqtt_client.on_connect = self.on_connect
         self.mqtt_client.on_message = self.on_message
 
+    def load_state(self):
+        if not os.path.exists(self.state_file):
+            return False
+        try:
+            with open(self.state_file, "r") as f:
+                state = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            print(f"⚠️ Could not read {self.state_file} ({e}), starting fresh.")
+            return False
+
+        topics = state.get("topics", {})
+        self.soil_topic = topics.get("soil_moisture")
+        self.weather_topic = topics.get("weather")
+        self.pump_topic = topics.get("pump_control")
+        self.config = state.get("config", {})
+        self.config_version = state.get("config_version")
+        self.pump_state = state.get("pump_state", self.pump_state)
+
+        # Readings that are too old must not drive irrigation decisions
+        now = time.time()
+        for sensor_id, reading in state.get("device_state", {}).items():
+            if now - reading.get("timestamp", 0) <= self.max_state_age:
+                self.device_state[sensor_id] = reading
+        self.last_soil_data = self.fresh_reading(state.get("last_soil_data"))
+        self.last_weather_data = self.fresh_reading(state.get("last_weather_data"))
+
+        print(f"Restored controller state from {self.state_file} (config version {self.config_version})")
+        return True
+
+    def fresh_reading(self, reading):
+        if reading and time.time() - reading.get("timestamp", 0) <= self.max_state_age:
+            return reading
+        return None
+
+    def save_state(self):
+        with self.state_lock:
+            state = {
+                "saved_at": time.time(),
+                "config_version": self.config_version,
+                "config": self.config,
+                "topics": {
+                    "soil_moisture": self.soil_topic,
+                    "weather": self.weather_topic,
+                    "pump_control": self.pump_topic
+                },
+                "last_soil_data": self.last_soil_data,
+                "last_weather_data": self.last_weather_data,
+                "device_state": self.device_state,
+                "pump_state": self.pump_state
+            }
+            # Write to a temp file first so a crash never leaves a half-written snapshot
+            tmp_file = f"{self.state_file}.tmp"
+            try:
+                with open(tmp_file, "w") as f:
+                    json.dump(state, f)
+                os.replace(tmp_file, self.state_file)
+                self.last_snapshot = state["saved_at"]
+            except OSError as e:
+                print(f"⚠️ Could not save controller state: {e}")
+
+    def maybe_save_state(self):
+        if time.time() - self.last_snapshot >= self.snapshot_interval:
+            self.save_state()
+
     def fetch_config(self):
         max_retries = 10
         retry_delay = 2
@@ -30,10 +106,10 @@ class CentralController:
                 topics = config.get("topics", {})
 
                 if all(k in topics for k in ("soil_moisture", "weather", "pump_control")):
-                    self.soil_topic = topics["soil_moisture"]
-                    self.weather_topic = topics["weather"]
-                    self.pump_topic = topics["pump_control"]
-                    self.config = config  # ✅ Store the full config including thresholds
+                    previous_version = self.config_version
+                    self.apply_config(config)
+                    if previous_version and previous_version != self.config_version:
+                        print(f"Config changed since last snapshot ({previous_version} -> {self.config_version})")
                     print("Configuration loaded successfully")
                     return
                 else:
@@ -44,24 +120,72 @@ class CentralController:
 
         raise Exception("Could not load config with all required topics after multiple retries")
 
+    def apply_config(self, config):
+        topics = config["topics"]
+        old_topics = (self.soil_topic, self.weather_topic)
+
+        self.soil_topic = topics["soil_moisture"]
+        self.weather_topic = topics["weather"]
+        self.pump_topic = topics["pump_control"]
+        self.config = config  # ✅ Store the full config including thresholds
+        self.config_version = config_version(config)
+
+        # Config may arrive after we are already connected with restored topics
+        if self.mqtt_client.is_connected():
+            for old, new in zip(old_topics, (self.soil_topic, self.weather_topic)):
+                if old != new:
+                    if old:
+                        self.mqtt_client.unsubscribe(old)
+                    self.mqtt_client.subscribe(new)
+        self.save_state()
+
+    def load_config_in_background(self):
+        def worker():
+            try:
+                self.fetch_config()
+            except Exception as e:
+                print(f"Config refresh failed, keeping restored config: {e}")
+
+        thread = threading.Thread(target=worker, daemon=True)
+        thread.start()
+        return thread
+
     def on_connect(self, client, userdata, flags, rc):
         print("Connected to MQTT broker.")
+        # Sensors publish retained readings, so subscribing delivers the last value immediately
         if self.soil_topic:
             client.subscribe(self.soil_topic)
         if self.weather_topic:
             client.subscribe(self.weather_topic)
+        # Resume decisions straight away from restored state
+        self.evaluate_irrigation()
 
     def on_message(self, client, userdata, msg):
         payload = json.loads(msg.payload.decode())
-        if msg.topic == self.soil_topic:
-            self.last_soil_data = payload
-        elif msg.topic == self.weather_topic:
-            self.last_weather_data = payload
+        # A retained reading can be arbitrarily old; apply the same cut-off as restored state
+        if not self.fresh_reading(payload):
+            print(f"Ignoring stale reading on {msg.topic}")
+            return
+        with self.state_lock:
+            if msg.topic == self.soil_topic:
+                self.last_soil_data = payload
+            elif msg.topic == self.weather_topic:
+                self.last_weather_data = payload
+            sensor_id = payload.get("sensor_id")
+            if sensor_id:
+                self.device_state[sensor_id] = payload
         self.evaluate_irrigation()
+        self.maybe_save_state()
+
+    def pump_running(self):
+        last = self.pump_state.get("last_activation")
+        return last is not None and time.time() < last + self.pump_state.get("duration", 0)
 
     def evaluate_irrigation(self):
         if not self.last_soil_data or not self.last_weather_data:
             return
+        if not self.pump_topic or self.pump_running():
+            return
         thresholds = self.config.get("thresholds", {"dry_soil": 30, "rain_threshold": 2})
         soil_moisture = self.last_soil_data["moisture"]
         rainfall = self.last_weather_data["rainfall"]
@@ -79,18 +203,27 @@ class CentralController:
         print(f"Sent command: {command}")
 
         # Log pump activation
-        log_entry = {
-            "duration": duration,
-            "timestamp": command["timestamp"]
+        self.pump_state = {
+            "last_activation": command["timestamp"],
+            "duration": duration
         }
-
-
+        self.save_state()
 
     def run(self, broker="localhost", port=1883):
-        self.fetch_config()
-        self.mqtt_client.connect(broker, port)
+        if self.load_state() and self.soil_topic and self.weather_topic:
+            # Warm restart: connect right away and refresh config concurrently
+            self.load_config_in_background()
+            self.mqtt_client.connect(broker, port)
+        else:
+            self.fetch_config()
+            self.mqtt_client.connect(broker, port)
         self.mqtt_client.loop_forever()
 
+def config_version(config):
+    # Changes whenever the topics or thresholds the controller acts on change
+    relevant = {"topics": config.get("topics"), "thresholds": config.get("thresholds")}
+    return hashlib.sha1(json.dumps(relevant, sort_keys=True).encode()).hexdigest()[:12]
+
 if __name__ == "__main__":
     controller = CentralController("http://localhost:8000")
     controller.run()
@@ -0,0 +1,93 @@
+# sensor_buffer.py
+from collections import deque
+import threading
+import random
+import json
+import time
+import os
+
+# Bounded on-disk ring buffer for readings that could not be published
+class ReadingBuffer:
+    def __init__(self, path, max_size=1000, batch_size=50, base_delay=1, max_delay=60,
+                 start_jitter=10, batch_interval=1):
+        self.path = path
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.start_jitter = start_jitter
+        self.batch_interval = batch_interval
+        self.lock = threading.Lock()
+        self.replay_thread = None
+        self.readings = deque(self.load(), maxlen=max_size)
+
+    def load(self):
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r") as f:
+                    return json.load(f)
+            except json.JSONDecodeError:
+                print(f"⚠️ Corrupted {self.path}, starting with an empty buffer.")
+        return []
+
+    def save(self):
+        # On a full or read-only disk the readings stay buffered in memory
+        tmp_file = f"{self.path}.tmp"
+        try:
+            with open(tmp_file, "w") as f:
+                json.dump(list(self.readings), f)
+            os.replace(tmp_file, self.path)
+        except OSError as e:
+            print(f"⚠️ Could not save {self.path}: {e}")
+
+    def __len__(self):
+        return len(self.readings)
+
+    def append(self, reading):
+        with self.lock:
+            if len(self.readings) == self.max_size:
+                print("⚠️ Buffer full, dropping oldest reading.")
+            self.readings.append(reading)
+            self.save()
+
+    def start_replay(self, client, topic):
+        # Replay runs on its own thread so the sensor keeps sampling meanwhile
+        with self.lock:
+            if not self.readings or (self.replay_thread and self.replay_thread.is_alive()):
+                return
+            self.replay_thread = threading.Thread(target=self.replay, args=(client, topic), daemon=True)
+            self.replay_thread.start()
+
+    def replay(self, client, topic):
+        # Publish buffered readings as JSON arrays on <topic>/batch until empty or disconnected.
+        # Batches are spaced out with jitter, and failures back off exponentially,
+        # so a fleet reconnecting together doesn't stampede the broker.
+        time.sleep(random.uniform(0, self.start_jitter))
+        attempt = 0
+        while client.is_connected():
+            with self.lock:
+                batch = list(self.readings)[:self.batch_size]
+            if not batch:
+                return
+
+            info = client.publish(f"{topic}/batch", json.dumps(batch), qos=1)
+            try:
+                info.wait_for_publish(timeout=10)
+                delivered = info.is_published()
+            except (RuntimeError, ValueError):
+                delivered = False
+
+            if delivered:
+                with self.lock:
+                    # The oldest entries may have been dropped by append() meanwhile
+                    for reading in batch:
+                        if self.readings and self.readings[0] == reading:
+                            self.readings.popleft()
+                    self.save()
+                print(f"Replayed {len(batch)} buffered readings, {len(self.readings)} left")
+                attempt = 0
+                time.sleep(random.uniform(0.5, 1.5) * self.batch_interval)
+            else:
+                delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+                time.sleep(random.uniform(0, delay))
+                attempt += 1
@@ -5,6 +5,7 @@ from datetime import datetime
 import time
 import json
 import random
+from Sensor_buffer import ReadingBuffer
 
 class WeatherSensor:
     def __init__(self, catalog_url, location):
@@ -17,6 +18,10 @@ class WeatherSensor:
         self.rainfall = 0.0
         self.mqtt_client = mqtt.Client()
         self.mqtt_client.on_connect = self.on_connect
+        self.mqtt_client.on_disconnect = self.on_disconnect
+        # Randomised starting delay spreads out reconnects when the whole fleet drops at once
+        self.mqtt_client.reconnect_delay_set(min_delay=random.uniform(1, 5), max_delay=120)
+        self.buffer = ReadingBuffer(f"buffer_weather_sensor_{location}.json")
 
     def register(self):
         payload = {"type": "weather_sensor", "location": self.location}
@@ -28,6 +33,10 @@ class WeatherSensor:
 
     def on_connect(self, client, userdata, flags, rc):
         print("Connected to MQTT broker.")
+        self.buffer.start_replay(client, self.topic)
+
+    def on_disconnect(self, client, userdata, rc):
+        print(f"Disconnected from MQTT broker (rc={rc}), buffering readings.")
 
     def simulate_reading(self):
         self.temperature += random.uniform(-1, 1)
@@ -46,15 +55,28 @@ class WeatherSensor:
             **self.simulate_reading(),
             "timestamp": time.time()
         }
-        self.mqtt_client.publish(self.topic, json.dumps(reading))
+        if not self.mqtt_client.is_connected():
+            self.buffer.append(reading)
+            print(f"Buffered: {reading}")
+            return
+        # Retained so late subscribers (e.g. a restarting controller) get the last value at once
+        info = self.mqtt_client.publish(self.topic, json.dumps(reading), qos=1, retain=True)
+        if info.rc != mqtt.MQTT_ERR_SUCCESS:
+            self.buffer.append(reading)
+            print(f"Publish failed, buffered: {reading}")
+            return
         print(f"Published: {reading}")
 
     def run(self, broker="localhost", port=1883, interval=15):
         self.register()
-        self.mqtt_client.connect(broker, port)
+        # connect_async lets us start buffering even if the broker is down at boot
+        self.mqtt_client.connect_async(broker, port)
         self.mqtt_client.loop_start()
         try:
             while True:
+                # Picks up readings buffered after a failed publish while still connected
+                if self.mqtt_client.is_connected():
+                    self.buffer.start_replay(self.mqtt_client, self.topic)
                 self.publish_reading()
                 time.sleep(interval)
         except KeyboardInterrupt:
@@ -5,16 +5,54 @@ import time
 import os
 import requests
 import datetime
+import bisect
+import threading
+import zlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+
+MAX_PAGE_SIZE = 100
+MAX_CACHE_ENTRIES = 256
+FRONTEND_CACHE_TTL = 2
+SHARE_GROUP = "stats"
 
 
 class StatsServer:
-    def __init__(self, catalog_url, broker="localhost", port=1883):
+    def __init__(self, catalog_url, broker="localhost", port=1883, thread_pool=10,
+                 http_port=5001, shard_index=0, shard_count=1, shared_subscription=True, http_host="127.0.0.1"):
         self.catalog_url = catalog_url
         self.broker = broker
         self.port = port
+        self.thread_pool = thread_pool
+        self.http_host = http_host
+        self.http_port = http_port
+
+        # Ingest sharding: each worker stores only its own partition of the device space,
+        # picked by the broker ($share subscription, the default) or by hashing the sensor_id.
+        # Hashing means every worker still receives and decodes every message.
+        self.shard_index = shard_index
+        self.shard_count = shard_count
+        self.shared_subscription = shared_subscription
+        self.db_file = "database.json" if shard_count == 1 else f"database_shard{shard_index}.json"
 
         self.topics = {}
 
+        # The database is kept in memory together with per-day aggregates and a sorted
+        # pump activation index, all updated on ingest so queries never rescan the history
+        self.db_lock = threading.RLock()
+        self.db = self.load_db()
+        self.daily = {}
+        self.pump_keys = []
+        self.pump_timestamps = []
+        self.pump_activations = []
+        self.build_stats()
+
+        # Endpoint responses, dropped whenever new data is ingested
+        self.cache = {}
+        self.cache_generation = 0
+        self.cache_lock = threading.Lock()
+
         self.mqtt_client = mqtt.Client()
         self.mqtt_client.on_connect = self.on_connect
         self.mqtt_client.on_message = self.on_message
@@ -37,8 +75,24 @@ class StatsServer:
     def on_connect(self, client, userdata, flags, rc):
         print("Connected to MQTT broker.")
         for topic_name, topic_str in self.topics.items():
-            client.subscribe(topic_str)
+            # Sensors publish at QoS 1; a QoS 0 subscription would downgrade delivery to at-most-once
+            qos = 1 if topic_name in ("soil_moisture", "weather") else 0
+            client.subscribe(self.subscription(topic_str), qos=qos)
             print(f"Subscribed to topic '{topic_name}': {topic_str}")
+            if topic_name in ("soil_moisture", "weather"):
+                # Sensors replay readings buffered while offline on <topic>/batch
+                client.subscribe(self.subscription(f"{topic_str}/batch"), qos=1)
+
+    def subscription(self, topic):
+        if self.shared_subscription and self.shard_count > 1:
+            return f"$share/{SHARE_GROUP}/{topic}"
+        return topic
+
+    def owns(self, key):
+        # With shared subscriptions the broker already gave us only our share
+        if self.shard_count == 1 or self.shared_subscription:
+            return True
+        return shard_for(key, self.shard_count) == self.shard_index
 
     def on_message(self, client, userdata, msg):
         try:
@@ -47,11 +101,11 @@ class StatsServer:
             print(f"Invalid JSON on topic {msg.topic}, skipping.")
             return
 
-        print(f"📥 Received message on topic {msg.topic}: {payload}")
-
         topic_type = None
+        is_batch = msg.topic.endswith("/batch")
+        base_topic = msg.topic[:-len("/batch")] if is_batch else msg.topic
         for key, topic in self.topics.items():
-            if msg.topic == topic:
+            if base_topic == topic:
                 topic_type = key
                 break
 
@@ -59,6 +113,25 @@ class StatsServer:
             print(f"Unknown topic {msg.topic}, skipping")
             return
 
+        # Drop other shards' messages before doing any further work on them
+        if is_batch:
+            if topic_type in ("soil_moisture", "weather") and isinstance(payload, list):
+                payload = [p for p in payload if isinstance(p, dict) and self.owns(p.get("sensor_id") or base_topic)]
+                if payload:
+                    print(f"📥 Received {len(payload)} replayed readings on topic {msg.topic}")
+                    self.save_batch_to_db(topic_type, payload)
+            else:
+                print(f"Invalid batch on topic {msg.topic}, skipping")
+            return
+
+        if not isinstance(payload, dict):
+            print(f"Unexpected payload on topic {msg.topic}, skipping.")
+            return
+        if not self.owns(payload.get("sensor_id") or msg.topic):
+            return
+
+        print(f"📥 Received message on topic {msg.topic}: {payload}")
+
         if topic_type == "soil_moisture":
             self.save_to_db("soil_moisture", payload)
         elif topic_type == "weather":
@@ -70,20 +143,42 @@ class StatsServer:
                    
 
     def save_to_db(self, sensor_type, payload):
-        timestamp = payload.get("timestamp", time.time())
-        date_key = time.strftime("%Y-%m-%d", time.localtime(timestamp))
+        with self.db_lock:
+            date_key = self.insert_reading(self.db, sensor_type, payload)
+            self.save_db(self.db)
+        print(f"✅ Saved {sensor_type} data for {date_key}")
 
-        db = self.load_db()
+    def save_batch_to_db(self, sensor_type, payloads):
+        with self.db_lock:
+            for payload in payloads:
+                if isinstance(payload, dict):
+                    self.insert_reading(self.db, sensor_type, payload)
+            self.save_db(self.db)
+        print(f"✅ Saved {len(payloads)} replayed {sensor_type} readings")
+
+    def insert_reading(self, db, sensor_type, payload):
+        # Late or replayed readings go into the day of their own timestamp, kept in time order
+        timestamp = payload.setdefault("timestamp", time.time())
+        date_key = time.strftime("%Y-%m-%d", time.localtime(timestamp))
 
         if date_key not in db:
             db[date_key] = {}
         if sensor_type not in db[date_key]:
             db[date_key][sensor_type] = []
 
-        db[date_key][sensor_type].append(payload)
+        readings = db[date_key][sensor_type]
+        timestamps = [r.get("timestamp", 0) for r in readings]
+        index = bisect.bisect_right(timestamps, timestamp)
 
-        self.save_db(db)
-        print(f"✅ Saved {sensor_type} data for {date_key}")
+        # QoS 1 replay and retained redelivery on reconnect can bring the same reading twice
+        sensor_id = payload.get("sensor_id")
+        for r in readings[bisect.bisect_left(timestamps, timestamp):index]:
+            if r.get("sensor_id") == sensor_id:
+                return date_key
+
+        readings.insert(index, payload)
+        self.add_reading_stats(date_key, sensor_type, payload)
+        return date_key
 
     def save_pump_activation(self, payload):
         timestamp = payload.get("timestamp", time.time())
@@ -95,129 +190,463 @@ class StatsServer:
         date_key = time.strftime("%Y-%m-%d", time.localtime(timestamp))
         log_entry = {"timestamp": timestamp, "duration": duration}
 
-        db = self.load_db()
+        with self.db_lock:
+            if date_key not in self.db:
+                self.db[date_key] = {}
+            if "pump_activations" not in self.db[date_key]:
+                self.db[date_key]["pump_activations"] = []
 
-        if date_key not in db:
-            db[date_key] = {}
-        if "pump_activations" not in db[date_key]:
-            db[date_key]["pump_activations"] = []
-
-        db[date_key]["pump_activations"].append(log_entry)
+            self.db[date_key]["pump_activations"].append(log_entry)
+            self.index_activation(date_key, log_entry)
 
-        self.save_db(db)
+            self.save_db(self.db)
         print(f"✅ Saved pump activation: {log_entry}")
 
+    def build_stats(self):
+        for date_key, day in self.db.items():
+            for sensor_type in ("soil_moisture", "weather"):
+                for reading in day.get(sensor_type, []):
+                    self.add_reading_stats(date_key, sensor_type, reading)
+            for activation in day.get("pump_activations", []):
+                self.index_activation(date_key, activation)
+
+    def day_stats(self, date_key):
+        if date_key not in self.daily:
+            self.daily[date_key] = {
+                "moisture_sum": 0, "soil_count": 0, "soil_latest": None,
+                "temperature_sum": 0, "humidity_sum": 0, "total_rainfall": 0,
+                "weather_count": 0, "weather_latest": None,
+                "pump_activations": 0
+            }
+        return self.daily[date_key]
+
+    def add_reading_stats(self, date_key, sensor_type, reading):
+        # Sums rather than averages, so partials from several shards can be merged exactly
+        day = self.day_stats(date_key)
+        try:
+            if sensor_type == "soil_moisture":
+                day["moisture_sum"] += reading["moisture"]
+                day["soil_count"] += 1
+                latest_key = "soil_latest"
+            else:
+                temperature, humidity, rainfall = reading["temperature"], reading["humidity"], reading["rainfall"]
+                day["temperature_sum"] += temperature
+                day["humidity_sum"] += humidity
+                day["total_rainfall"] += rainfall
+                day["weather_count"] += 1
+                latest_key = "weather_latest"
+        except (KeyError, TypeError):
+            print(f"⚠️ Incomplete {sensor_type} reading left out of statistics: {reading}")
+            return
+
+        latest = day[latest_key]
+        if latest is None or reading.get("timestamp", 0) >= latest.get("timestamp", 0):
+            day[latest_key] = reading
+
+    def index_activation(self, date_key, activation):
+        key = activation_key(activation)
+        index = bisect.bisect_right(self.pump_keys, key)
+        self.pump_keys.insert(index, key)
+        self.pump_timestamps.insert(index, activation.get("timestamp", 0))
+        self.pump_activations.insert(index, activation)
+        self.day_stats(date_key)["pump_activations"] += 1
+
     def load_db(self):
-        if os.path.exists("database.json"):
+        if os.path.exists(self.db_file):
             try:
-                with open("database.json", "r") as f:
+                with open(self.db_file, "r") as f:
                     return json.load(f)
             except json.JSONDecodeError:
-                print("⚠️ Corrupted database.json, starting fresh.")
+                print(f"⚠️ Corrupted {self.db_file}, starting fresh.")
                 return {}
         return {}
 
     def save_db(self, db):
-        with open("database.json", "w") as f:
+        with open(self.db_file, "w") as f:
             json.dump(db, f, indent=2)
+        self.invalidate_cache()
+
+    def invalidate_cache(self):
+        with self.cache_lock:
+            self.cache.clear()
+            self.cache_generation += 1
+
+    def cached(self, key, compute):
+        with self.cache_lock:
+            if key in self.cache:
+                return self.cache[key]
+            generation = self.cache_generation
+
+        result = compute()
+
+        with self.cache_lock:
+            # Don't store a result computed from data that was replaced meanwhile
+            if generation == self.cache_generation:
+                if len(self.cache) >= MAX_CACHE_ENTRIES:
+                    self.cache.clear()
+                self.cache[key] = result
+        return result
 
 
     @cherrypy.expose
     @cherrypy.tools.json_out()
     def soil(self):
+        return self.cached("soil", self.soil_summary)
 
+    def soil_summary(self):
         try:
-            with open("database.json", "r") as f:
-                db = json.load(f)
-
-            all_dates = sorted(db.keys(), reverse=True)
-            for date in all_dates:
-                soil_data = db[date].get("soil_moisture")
-                if soil_data:
-                    latest = format_timestamp(soil_data[-1])
-                    avg = sum(d["moisture"] for d in soil_data) / len(soil_data)
-                    return {
-                        "latest": latest,
-                        "average_moisture": round(avg,2),
-                        "readings_count": len(soil_data)
-                    }
-
-            return {"error": "No data available"}
+            return merge_soil([self.soil_partial()])
         except Exception as e:
             return {"error": str(e)}
-            
+
+    def soil_partial(self):
+        with self.db_lock:
+            dates = [date for date, day in self.daily.items() if day["soil_count"]]
+            if not dates:
+                return None
+            date = max(dates)
+            day = self.daily[date]
+            return {
+                "date": date,
+                "latest": day["soil_latest"],
+                "moisture_sum": day["moisture_sum"],
+                "readings_count": day["soil_count"]
+            }
 
     @cherrypy.expose
     @cherrypy.tools.json_out()
     def weather(self):
+        return self.cached("weather", self.weather_summary)
+
+    def weather_summary(self):
         try:
-            with open("database.json", "r") as f:
-                db = json.load(f)
-
-            all_dates = sorted(db.keys(), reverse=True)
-            for date in all_dates:
-                weather_data = db[date].get("weather")
-                if weather_data:
-                    latest = format_timestamp(weather_data[-1])
-                    avg_temp = sum(d["temperature"] for d in weather_data) / len(weather_data)
-                    avg_humidity = sum(d["humidity"] for d in weather_data) / len(weather_data)
-                    total_rain = sum(d["rainfall"] for d in weather_data)
-                    return {
-                        "latest": latest,
-                        "average_temperature": round(avg_temp,2),
-                        "average_humidity": round(avg_humidity,2),
-                        "total_rainfall": total_rain,
-                        "readings_count": len(weather_data)
-                    }
-
-            return {"error": "No data available"}
+            return merge_weather([self.weather_partial()])
         except Exception as e:
             return {"error": str(e)}
-        
+
+    def weather_partial(self):
+        with self.db_lock:
+            dates = [date for date, day in self.daily.items() if day["weather_count"]]
+            if not dates:
+                return None
+            date = max(dates)
+            day = self.daily[date]
+            return {
+                "date": date,
+                "latest": day["weather_latest"],
+                "temperature_sum": day["temperature_sum"],
+                "humidity_sum": day["humidity_sum"],
+                "total_rainfall": day["total_rainfall"],
+                "readings_count": day["weather_count"]
+            }
+
     @cherrypy.expose
     @cherrypy.tools.json_out()
-    def pump(self):
+    def pump(self, cursor=None, limit=20):
+        # Activations newest first, one page at a time; pass back next_cursor to continue
         try:
-            with open("database.json", "r") as f:
-                db = json.load(f)
+            limit, cursor = parse_page(cursor, limit)
+        except ValueError:
+            return {"error": "Invalid cursor or limit"}
+        return self.cached(("pump", cursor, limit), lambda: self.pump_page(cursor, limit))
+
+    def pump_page(self, cursor, limit):
+        try:
+            return merge_pump([self.pump_partial(cursor, limit)], cursor, limit)
+        except Exception as e:
+            return {"error": str(e)}
 
-            all_dates = sorted(db.keys(), reverse=True)
-            all_activations = []
-            for date in all_dates:
-                activations = db[date].get("pump_activations", [])
-                all_activations.extend(activations)
+    def pump_partial(self, cursor, limit):
+        with self.db_lock:
+            # Include the cursor's own timestamp; merge_pump skips the ones already returned
+            if cursor is None:
+                end, wanted = len(self.pump_activations), limit
+            else:
+                end, wanted = bisect.bisect_right(self.pump_timestamps, cursor[0]), cursor[1] + limit
+            start = max(0, end - wanted)
+            return {
+                "total_activations": len(self.pump_activations),
+                "last_activation": self.pump_activations[-1] if self.pump_activations else None,
+                "activations": self.pump_activations[start:end][::-1],
+                "has_more": start > 0
+            }
 
-            if not all_activations:
-                return {
-                    "total_activations": 0,
-                    "last_activation": None,
-                    "activations": []
-                }
+    @cherrypy.expose
+    @cherrypy.tools.json_out()
+    def history(self, date):
+        return self.cached(("history", date), lambda: self.history_summary(date))
 
-            last = format_timestamp(all_activations[-1])
-            formatted_activations = [format_timestamp(a) for a in all_activations]
+    def history_summary(self, date):
+        try:
+            return merge_history([self.history_partial(date)], date)
+        except Exception as e:
+            return {"error": str(e)}
 
+    def history_partial(self, date):
+        with self.db_lock:
+            day = self.daily.get(date)
+            if not day:
+                return None
             return {
-                "total_activations": len(all_activations),
-                "last_activation": last,
-                "activations": formatted_activations
+                "moisture_sum": day["moisture_sum"],
+                "soil_count": day["soil_count"],
+                "temperature_sum": day["temperature_sum"],
+                "humidity_sum": day["humidity_sum"],
+                "total_rainfall": day["total_rainfall"],
+                "weather_count": day["weather_count"],
+                "pump_activations": day["pump_activations"]
             }
+
+    @cherrypy.expose
+    @cherrypy.tools.json_out()
+    def partial(self, kind, cursor=None, limit=20, date=None):
+        # Unmerged aggregates of this shard, queried by StatsFrontend
+        try:
+            if kind == "soil":
+                return self.cached(("partial", kind), self.soil_partial)
+            if kind == "weather":
+                return self.cached(("partial", kind), self.weather_partial)
+            if kind == "pump":
+                try:
+                    limit, cursor = parse_page(cursor, limit)
+                except ValueError:
+                    return {"error": "Invalid cursor or limit"}
+                return self.cached(("partial", kind, cursor, limit), lambda: self.pump_partial(cursor, limit))
+            if kind == "history":
+                return self.cached(("partial", kind, date), lambda: self.history_partial(date))
+            return {"error": f"Unknown kind {kind}"}
         except Exception as e:
             return {"error": str(e)}
 
-
     def run(self):
         self.fetch_config()
         self.mqtt_client.connect(self.broker, self.port)
         self.mqtt_client.loop_start()
 
-        cherrypy.config.update({
-            'server.socket_host': '127.0.0.1',
-            'server.socket_port': 5001,
-            'log.screen': True
-        })
+        serve(self, self.http_host, self.http_port, self.thread_pool)
+
+class StatsFrontend:
+    # Query front-end for sharded ingest: fans out to every worker and merges their partials
+    def __init__(self, shard_urls, thread_pool=10, http_port=5001, http_host="127.0.0.1"):
+        self.shard_urls = shard_urls
+        self.thread_pool = thread_pool
+        self.http_host = http_host
+        self.http_port = http_port
+        self.executor = ThreadPoolExecutor(max_workers=len(shard_urls))
+
+        # Workers don't tell the front-end about ingest, so merged partials expire after a short TTL
+        self.cache = {}
+        self.cache_lock = threading.Lock()
+
+    def fan_out(self, params):
+        key = tuple(sorted(params.items()))
+        with self.cache_lock:
+            entry = self.cache.get(key)
+            if entry and entry[0] > time.time():
+                return entry[1]
+
+        def query(url):
+            # An unreachable or failing worker is reported rather than failing the whole query
+            try:
+                response = requests.get(f"{url}/partial", params=params, timeout=5)
+                response.raise_for_status()
+                partial = response.json()
+            except Exception as e:
+                print(f"⚠️ Shard {url} unavailable: {e}")
+                return url, False, None
+            if isinstance(partial, dict) and "error" in partial:
+                print(f"⚠️ Shard {url} returned an error: {partial['error']}")
+                return url, False, None
+            return url, True, partial
+
+        results = list(self.executor.map(query, self.shard_urls))
+        partials = [partial for url, ok, partial in results if ok]
+        missing = [url for url, ok, partial in results if not ok]
+        if not partials:
+            raise Exception("No shard reachable")
+
+        with self.cache_lock:
+            if len(self.cache) >= MAX_CACHE_ENTRIES:
+                self.cache.clear()
+            self.cache[key] = (time.time() + FRONTEND_CACHE_TTL, (partials, missing))
+        return partials, missing
+
+    def merged(self, params, merge):
+        try:
+            partials, missing = self.fan_out(params)
+        except Exception as e:
+            return {"error": str(e), "missing_shards": self.shard_urls}
+        result = merge(partials)
+        if missing:
+            # Degraded answer built from the shards that did respond
+            result["missing_shards"] = missing
+        return result
+
+    @cherrypy.expose
+    @cherrypy.tools.json_out()
+    def soil(self):
+        return self.merged({"kind": "soil"}, merge_soil)
 
-        cherrypy.quickstart(self)
+    @cherrypy.expose
+    @cherrypy.tools.json_out()
+    def weather(self):
+        return self.merged({"kind": "weather"}, merge_weather)
+
+    @cherrypy.expose
+    @cherrypy.tools.json_out()
+    def pump(self, cursor=None, limit=20):
+        try:
+            limit, cursor = parse_page(cursor, limit)
+        except ValueError:
+            return {"error": "Invalid cursor or limit"}
+        params = {"kind": "pump", "limit": limit}
+        if cursor is not None:
+            params["cursor"] = format_cursor(*cursor)
+        return self.merged(params, lambda partials: merge_pump(partials, cursor, limit))
+
+    @cherrypy.expose
+    @cherrypy.tools.json_out()
+    def history(self, date):
+        return self.merged({"kind": "history", "date": date}, lambda partials: merge_history(partials, date))
+
+    def run(self):
+        serve(self, self.http_host, self.http_port, self.thread_pool)
+
+
+def serve(root, http_host, http_port, thread_pool):
+    cherrypy.config.update({
+        'server.socket_host': http_host,
+        'server.socket_port': http_port,
+        'server.thread_pool': thread_pool,
+        'server.socket_queue_size': 2 * thread_pool,
+        'log.screen': True
+    })
+
+    conf = {
+        '/': {
+            'tools.gzip.on': True,
+            'tools.gzip.mime_types': ['application/json', 'text/*']
+        }
+    }
+    cherrypy.quickstart(root, '/', conf)
+
+def shard_for(key, shard_count):
+    # crc32 rather than hash(), which is salted per process
+    return zlib.crc32(str(key).encode()) % shard_count
+
+def parse_page(cursor, limit):
+    # A cursor is "<timestamp>:<n>": continue after the first n activations at that timestamp
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    if cursor is not None:
+        timestamp, skip = cursor.rsplit(":", 1)
+        skip = int(skip)
+        # n only counts activations sharing one timestamp, so it stays small for any real cursor
+        if not 0 <= skip <= MAX_PAGE_SIZE:
+            raise ValueError("cursor offset out of range")
+        cursor = (float(timestamp), skip)
+    return limit, cursor
+
+def format_cursor(timestamp, skip):
+    return f"{timestamp!r}:{skip}"
+
+def activation_key(activation):
+    # Total order, so activations sharing a timestamp page the same way on every shard
+    return (activation.get("timestamp", 0), json.dumps(activation, sort_keys=True))
+
+def latest_partials(partials):
+    # Only the most recent day is reported, so drop shards whose latest data is older
+    partials = [p for p in partials if p]
+    if not partials:
+        return []
+    date = max(p["date"] for p in partials)
+    return [p for p in partials if p["date"] == date]
+
+def latest_reading(partials):
+    return max((p["latest"] for p in partials), key=lambda r: r.get("timestamp", 0))
+
+def merge_soil(partials):
+    partials = latest_partials(partials)
+    if not partials:
+        return {"error": "No data available"}
+    count = sum(p["readings_count"] for p in partials)
+    avg = sum(p["moisture_sum"] for p in partials) / count
+    return {
+        "latest": format_timestamp(latest_reading(partials)),
+        "average_moisture": round(avg,2),
+        "readings_count": count
+    }
+
+def merge_weather(partials):
+    partials = latest_partials(partials)
+    if not partials:
+        return {"error": "No data available"}
+    count = sum(p["readings_count"] for p in partials)
+    avg_temp = sum(p["temperature_sum"] for p in partials) / count
+    avg_humidity = sum(p["humidity_sum"] for p in partials) / count
+    total_rain = sum(p["total_rainfall"] for p in partials)
+    return {
+        "latest": format_timestamp(latest_reading(partials)),
+        "average_temperature": round(avg_temp,2),
+        "average_humidity": round(avg_humidity,2),
+        "total_rainfall": total_rain,
+        "readings_count": count
+    }
+
+def merge_pump(partials, cursor, limit):
+    # Each partial holds its newest activations up to the cursor timestamp, newest first
+    merged = sorted(
+        (a for p in partials for a in p["activations"]),
+        key=activation_key,
+        reverse=True
+    )
+    skip = cursor[1] if cursor else 0
+    page = merged[skip:skip + limit]
+    has_more = len(merged) > skip + limit or any(p["has_more"] for p in partials)
+
+    next_cursor = None
+    if has_more and page:
+        timestamp = page[-1].get("timestamp", 0)
+        seen = sum(1 for a in page if a.get("timestamp", 0) == timestamp)
+        if cursor and cursor[0] == timestamp:
+            seen += skip
+        next_cursor = format_cursor(timestamp, seen)
+    lasts = [p["last_activation"] for p in partials if p["last_activation"]]
+    last = max(lasts, key=lambda a: a.get("timestamp", 0)) if lasts else None
+
+    return {
+        "total_activations": sum(p["total_activations"] for p in partials),
+        "last_activation": format_timestamp(last),
+        "activations": [format_timestamp(a) for a in page],
+        "next_cursor": next_cursor
+    }
+
+def merge_history(partials, date):
+    partials = [p for p in partials if p]
+    if not partials:
+        return {"error": f"No data available for {date}"}
+
+    soil_count = sum(p["soil_count"] for p in partials)
+    weather_count = sum(p["weather_count"] for p in partials)
+    soil = None
+    if soil_count:
+        soil = {
+            "average_moisture": round(sum(p["moisture_sum"] for p in partials) / soil_count, 2),
+            "readings_count": soil_count
+        }
+    weather = None
+    if weather_count:
+        weather = {
+            "average_temperature": round(sum(p["temperature_sum"] for p in partials) / weather_count, 2),
+            "average_humidity": round(sum(p["humidity_sum"] for p in partials) / weather_count, 2),
+            "total_rainfall": sum(p["total_rainfall"] for p in partials),
+            "readings_count": weather_count
+        }
+    return {
+        "date": date,
+        "soil": soil,
+        "weather": weather,
+        "pump_activations": sum(p["pump_activations"] for p in partials)
+    }
 
 def format_timestamp(entry):
         #Convert timestamp to readable format if present
@@ -230,5 +659,29 @@ def format_timestamp(entry):
             return entry
 
 if __name__ == "__main__":
-    server = StatsServer("http://localhost:8000")  
-    server.run()
+    parser = argparse.ArgumentParser(description="Smart Garden statistics service")
+    parser.add_argument("--host", default="127.0.0.1", help="HTTP bind address (0.0.0.0 to serve other nodes)")
+    parser.add_argument("--port", type=int, default=5001, help="HTTP port")
+    parser.add_argument("--broker", default="localhost", help="MQTT broker host")
+    parser.add_argument("--broker-port", type=int, default=1883, help="MQTT broker port")
+    parser.add_argument("--catalog", default="http://localhost:8000", help="data catalog URL")
+    parser.add_argument("--threads", type=int, default=10, help="HTTP worker thread pool size")
+    parser.add_argument("--shard", default="0/1", help="ingest partition of this worker as INDEX/COUNT")
+    parser.add_argument("--hash", action="store_true",
+                        help="partition by sensor_id hash instead of $share subscriptions (each worker sees every message)")
+    parser.add_argument("--frontend", nargs="+", metavar="URL", help="run as query front-end over these shard URLs")
+    args = parser.parse_args()
+
+    if args.frontend:
+        StatsFrontend(args.frontend, thread_pool=args.threads, http_port=args.port, http_host=args.host).run()
+    else:
+        try:
+            index, count = (int(n) for n in args.shard.split("/"))
+        except ValueError:
+            parser.error("--shard must look like INDEX/COUNT, e.g. 0/2")
+        if not 0 <= index < count:
+            parser.error("--shard INDEX must satisfy 0 <= INDEX < COUNT")
+        server = StatsServer(args.catalog, broker=args.broker, port=args.broker_port,
+                             thread_pool=args.threads, http_port=args.port, http_host=args.host,
+                             shard_index=index, shard_count=count, shared_subscription=not args.hash)
+        server.run()
@@ -8,8 +8,6 @@ from telegram.ext import (
 )
 from datetime import datetime
 import requests
-import json
-import os
 
 class TelegramBot:
     def __init__(self, token, stats_url):
@@ -84,47 +82,40 @@ class TelegramBot:
 
     async def send_history(self, update: Update, date_str: str):
         try:
-            if not os.path.exists("database.json"):
-                await update.message.reply_text("📁 No database found.")
-                return
-
-            with open("database.json", "r") as f:
-                db = json.load(f)
+            response = requests.get(f"{self.stats_url}/history", params={"date": date_str})
+            day_data = response.json()
 
-            if date_str not in db:
-                await update.message.reply_text(f"❌ No data available for {date_str}")
+            if "error" in day_data:
+                await update.message.reply_text(f"❌ {day_data['error']}")
                 return
 
-            day_data = db[date_str]
             message = f"📊 Data for {date_str}:\n"
 
             # Soil
-            soil_entries = day_data.get("soil_moisture", [])
-            if soil_entries:
-                avg_soil = sum(d["moisture"] for d in soil_entries) / len(soil_entries)
-                message += f"\n💧 Soil Moisture: {avg_soil:.1f}% (avg, {len(soil_entries)} readings)"
+            soil = day_data.get("soil")
+            if soil:
+                message += f"\n💧 Soil Moisture: {soil['average_moisture']:.1f}% (avg, {soil['readings_count']} readings)"
             else:
                 message += "\n💧 Soil Moisture: No data"
 
             # Weather
-            weather_entries = day_data.get("weather", [])
-            if weather_entries:
-                avg_temp = sum(d["temperature"] for d in weather_entries) / len(weather_entries)
-                avg_humidity = sum(d["humidity"] for d in weather_entries) / len(weather_entries)
-                total_rain = sum(d["rainfall"] for d in weather_entries)
+            weather = day_data.get("weather")
+            if weather:
                 message += (
-                    f"\n🌡 Temp: {avg_temp:.1f}°C | 💦 Humidity: {avg_humidity:.1f}% | ☔ Rain: {total_rain:.1f}mm"
+                    f"\n🌡 Temp: {weather['average_temperature']:.1f}°C | 💦 Humidity: {weather['average_humidity']:.1f}% | ☔ Rain: {weather['total_rainfall']:.1f}mm"
                 )
             else:
                 message += "\n🌡 Weather: No data"
 
             # Pump
-            pump_entries = day_data.get("pump_activations", [])
-            if pump_entries:
-                message += f"\n🚰 Pump Activations: {len(pump_entries)}"
+            if day_data.get("pump_activations"):
+                message += f"\n🚰 Pump Activations: {day_data['pump_activations']}"
             else:
                 message += "\n🚰 Pump: No activations"
 
+            if day_data.get("missing_shards"):
+                message += "\n\n⚠️ Some statistics workers did not respond, figures may be incomplete."
+
             await update.message.reply_text(message)
         except Exception as e:
             await update.message.reply_text(f"Error loading history: {e}")